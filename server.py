@@ -1,78 +1,313 @@
 import os
 import re
+import sys
 import json
+import ctypes
+import email.utils
+import errno
+import functools
+import gzip
 import mimetypes
+import mmap
+import multiprocessing
+import queue
+import select
+import selectors
+import socket
+import stat
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
 from pathlib import Path
 from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 
+# orjson (opcional) serializa directo a bytes UTF-8 compactos, mucho más rápido
+try:
+    import orjson
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+
+    def _dump(obj, fp):
+        fp.write(orjson.dumps(obj))
+except ImportError:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def _dumps(obj) -> bytes:
+        return _encoder.encode(obj).encode("utf-8")
+
+    def _dump(obj, fp):
+        # sin orjson: escribir por partes, sin armar todo el string en memoria
+        fp.writelines(chunk.encode("utf-8") for chunk in _encoder.iterencode(obj))
+
+    orjson = None
+    _loads = json.loads
+
 # ---------- Config ----------
 PORT = 5432
 ROOT = Path(".").resolve()
 IGNORE_DIRS = {".git", "node_modules", "examples", "__pycache__", ".venv"}
 ALLOW_EXTS = {".wav", ".flac", ".ogg"}  # renombrar y listar en JSON
 JSON_NAME = "strudel.json"
+REBUILD_DEBOUNCE = 2.0  # segundos: /rebuild repetido sin cambios devuelve el resultado cacheado
+PARALLEL_SCAN_MIN_FILES = 50_000  # archivos (estimados) a partir de los que se escanea en paralelo
+HTTP_TIMEOUT = 30  # segundos sin actividad antes de cortar una conexión
+HTTP_THREADS = (os.cpu_count() or 1) * 2  # se puede cambiar con STRUDEL_HTTP_THREADS
 # ----------------------------
 
+def _env_threads(default: int) -> int:
+    """STRUDEL_HTTP_THREADS si es un entero >= 1; si no, el default (con aviso)."""
+    raw = os.environ.get("STRUDEL_HTTP_THREADS")
+    if not raw:
+        return default
+    try:
+        n = int(raw)
+    except ValueError:
+        n = 0
+    if n < 1:
+        if __name__ == "__main__":  # no repetir el aviso en los workers del scan
+            print(f"[warn] STRUDEL_HTTP_THREADS={raw!r} inválido, uso {default}")
+        return default
+    return n
+
+HTTP_THREADS = _env_threads(HTTP_THREADS)
+
+_ROOT_STR = str(ROOT)
+_IGNORE = frozenset(IGNORE_DIRS)
+_skip_dir = _IGNORE.__contains__  # método ligado: sin lookup en cada directorio
+_ALLOW_TAILS = tuple(ALLOW_EXTS)  # para str.endswith, ya en minúsculas
+
+_SP = re.compile(r"\s+")
+_DH = re.compile(r"-{2,}")
+_RANGE_RE = re.compile(r"bytes=(\d*)-(\d*)$")
+
+def _load_json_file(path):
+    """
+    Parsea un JSON desde un mmap del archivo (sin copiarlo a un bytes intermedio).
+    Seguro porque generate_json nunca reescribe el archivo en el lugar (ver os.replace).
+    """
+    with open(path, "rb") as f:
+        if orjson is None:
+            return _loads(f.read())  # json.loads no acepta memoryview: el mmap no ahorra nada
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (ValueError, OSError):
+            # archivo vacío o plataforma sin mmap
+            return _loads(f.read())
+        try:
+            with memoryview(mm) as view:
+                return _loads(view)
+        finally:
+            mm.close()
+
 def safe_audio_name(filename: str) -> str:
     """Reemplaza espacios por '-', colapsa '-' consecutivos, mantiene extensión."""
-    p = Path(filename)
-    stem = re.sub(r"\s+", "-", p.stem.strip())
-    stem = re.sub(r"-{2,}", "-", stem)
-    return f"{stem}{p.suffix}"
+    # Camino rápido: sin espacios (isprintable descarta el resto de whitespace) ni '--'
+    if " " not in filename and "--" not in filename and filename.isprintable():
+        return filename
+    i = filename.rfind(".")
+    if i <= 0:
+        stem, ext = filename, ""
+    else:
+        stem, ext = filename[:i], filename[i:]
+    stem = _SP.sub("-", stem.strip())
+    stem = _DH.sub("-", stem)
+    return f"{stem}{ext}"
+
+# renameat2(RENAME_NOREPLACE) en Linux: renombra sólo si el destino no existe, en una
+# sola syscall (sin ventana entre el chequeo y el rename). Fuera de Linux: lexists + os.rename.
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+
+def _load_renameat2():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        fn = ctypes.CDLL(None, use_errno=True).renameat2  # glibc >= 2.28
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    fn.restype = ctypes.c_int
+    return fn
 
-def rename_files():
+_renameat2 = _load_renameat2()
+
+def _rename_noreplace(src: str, dst: str) -> bool:
+    """Renombra src -> dst sin pisar; devuelve False si dst ya existe."""
+    if _renameat2 is not None:
+        if _renameat2(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dst), _RENAME_NOREPLACE) == 0:
+            return True
+        err = ctypes.get_errno()
+        if err == errno.EEXIST:
+            return False
+        if err not in (errno.EINVAL, errno.ENOSYS):  # FS sin soporte del flag -> os.rename
+            raise OSError(err, os.strerror(err), src, None, dst)
+    # os.rename pisa en silencio (macOS, FS case-insensitive): un stat por rename real
+    if os.path.lexists(dst):
+        return False
+    try:
+        os.rename(src, dst)
+    except FileExistsError:  # Windows
+        return False
+    return True
+
+def _walk(root, recursive=True):
+    """Recorre el árbol con os.scandir (sin stat extra), podando dirs ocultos/ignorados."""
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return  # ilegible o borrado durante el recorrido: se saltea, como os.walk
+    with it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                name = e.name
+                if not recursive or name[:1] == "." or _skip_dir(name):
+                    continue
+                yield from _walk(e.path)
+            elif e.is_file():  # sigue symlinks a archivos, como os.walk
+                yield e
+
+def rename_files(root=ROOT, recursive=True):
     """Renombra wav/flac/ogg reemplazando espacios por '-' y resolviendo colisiones."""
-    for dirpath, dirs, files in os.walk(ROOT, topdown=True):
-        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in IGNORE_DIRS]
-        for fname in files:
-            src = Path(dirpath) / fname
-            if src.suffix.lower() not in ALLOW_EXTS:
-                continue
-            target_name = safe_audio_name(src.name)
-            if target_name == src.name:
-                continue
-            dst = src.with_name(target_name)
-            if dst.exists():
-                base = Path(target_name).stem
-                ext = Path(target_name).suffix
-                i = 1
-                while True:
-                    cand = src.with_name(f"{base}-{i}{ext}")
-                    if not cand.exists():
-                        dst = cand
-                        break
-                    i += 1
-            print(f"[rename] {src.name} -> {dst.name}")
-            src.rename(dst)
+    pending = []
+    for entry in _walk(root, recursive):
+        name = entry.name
+        low = name if name.islower() else name.lower()
+        if not low.endswith(_ALLOW_TAILS):
+            continue
+        target_name = safe_audio_name(name)
+        if target_name == name:
+            continue
+        pending.append((os.path.dirname(entry.path), name, target_name))
+    # colisiones contra un set de nombres por carpeta (un listdir, sin exists() por candidato)
+    by_dir = {}
+    for parent, name, target_name in pending:
+        names = by_dir.get(parent)
+        if names is None:
+            names = by_dir[parent] = set(os.listdir(parent))
+        # el set evita casi todos los intentos; renameat2 confirma sin pisar
+        src = os.path.join(parent, name)
+        base, ext = os.path.splitext(target_name)
+        dst_name = target_name
+        i = 0
+        while dst_name in names or not _rename_noreplace(src, os.path.join(parent, dst_name)):
+            names.add(dst_name)
+            i += 1
+            dst_name = f"{base}-{i}{ext}"
+        print(f"[rename] {name} -> {dst_name}")
+        names.discard(name)
+        names.add(dst_name)
+
+def _collect(root):
+    """Lista (carpeta inmediata, '/ruta/relativa') de los audios bajo root."""
+    root_len = len(str(ROOT)) + 1
+    items = []
+    for entry in _walk(root):
+        fname = entry.name
+        low = fname if fname.islower() else fname.lower()
+        if not low.endswith(_ALLOW_TAILS):
+            continue
+        rel = entry.path[root_len:]
+        if os.sep != "/":
+            rel = rel.replace(os.sep, "/")
+        rel_dir, sep, _ = rel.rpartition("/")
+        if not sep:
+            continue  # archivos sueltos en ROOT no forman grupo
+        items.append((rel_dir[rel_dir.rfind("/") + 1:], "/" + rel))
+    return items
 
-def generate_json(base_url: str = f"http://localhost:{PORT}/"):
+def _scan_subtree(top, rename=False):
+    """Worker: renombra (opcional) y lista una carpeta de primer nivel."""
+    if rename:
+        rename_files(top)
+    return _collect(top)
+
+def _scan(rename=False):
+    """
+    Recorre ROOT (un proceso por carpeta de primer nivel si el árbol es grande);
+    devuelve la lista plana de (grupo, ruta).
+    """
+    if rename:
+        rename_files(ROOT, recursive=False)
+    with os.scandir(ROOT) as it:
+        tops = [e.path for e in it
+                if e.is_dir(follow_symlinks=False)
+                and e.name[:1] != "." and not _skip_dir(e.name)]
+    # el pool cuesta ~150 ms en levantar: sólo paralelizar si hay trabajo de sobra
+    # (carpetas ilegibles se saltean, como en _walk)
+    readable, n_files = [], 0
+    for top in tops:
+        try:
+            n_files += len(os.listdir(top))
+        except OSError:
+            continue
+        readable.append(top)
+    tops = readable
+    if len(tops) < 2 or n_files < PARALLEL_SCAN_MIN_FILES:
+        results = [_scan_subtree(top, rename) for top in tops]
+    else:
+        # spawn: /rebuild corre dentro de un server con threads, no conviene fork
+        ctx = multiprocessing.get_context("spawn")
+        with ProcessPoolExecutor(max_workers=min(len(tops), os.cpu_count() or 1), mp_context=ctx) as ex:
+            results = list(ex.map(_scan_subtree, tops, [rename] * len(tops)))
+    return [item for items in results for item in items]
+
+def generate_json(base_url: str = f"http://localhost:{PORT}/", rename: bool = False):
     """
     Genera strudel.json (agrupado por carpeta inmediata). _base se escribirá con un valor
     placeholder local; igualmente el server lo reescribe dinámicamente al responder.
+    Con rename=True los mismos workers renombran (rename_files) antes de listar.
     """
     data = {"_base": base_url}
-    for dirpath, dirs, files in os.walk(ROOT, topdown=True):
-        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in IGNORE_DIRS]
-        rel_dir = Path(dirpath).relative_to(ROOT)
-        if rel_dir == Path("."):
-            continue
-        name = rel_dir.name
-        if name.startswith(".") or name in IGNORE_DIRS:
-            continue
-        items = []
-        for f in files:
-            p = Path(dirpath) / f
-            if p.suffix.lower() in ALLOW_EXTS:
-                rel = p.relative_to(ROOT).as_posix()
-                items.append("/" + rel)
-        if items:
-            items.sort()
-            data.setdefault(name, []).extend(items)
-    with open(ROOT / JSON_NAME, "w", encoding="utf-8", newline="\n") as fp:
-        json.dump(data, fp, ensure_ascii=False, separators=(",", ":"))
+    all_items = _scan(rename)
+    all_items.sort()
+    for name, group in groupby(all_items, key=lambda t: t[0]):
+        data[name] = [p for _, p in group]
+    # temporal + os.replace: quien tenga el JSON abierto/mapeado sigue viendo el archivo viejo
+    target = ROOT / JSON_NAME
+    tmp = ROOT / f"{JSON_NAME}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as fp:
+            _dump(data, fp)
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
     print(f"[ok] {JSON_NAME} generado.")
 
+# Estado del último /rebuild (debounce)
+_rebuild_state = {"last": 0.0, "root_mtime": 0}
+_rebuild_lock = threading.Lock()
+
+def _root_mtime() -> int:
+    """mtime más reciente de ROOT y sus entradas de primer nivel (barato: sin recursión)."""
+    cur = os.stat(ROOT).st_mtime_ns
+    with os.scandir(ROOT) as it:
+        for e in it:
+            try:
+                cur = max(cur, e.stat(follow_symlinks=False).st_mtime_ns)
+            except OSError:
+                pass
+    return cur
+
+def rebuild(base_url: str = f"http://localhost:{PORT}/") -> bool:
+    """
+    Renombra + regenera el JSON, salvo que el último rebuild haya sido hace menos de
+    REBUILD_DEBOUNCE segundos y nada cambió en el primer nivel. Devuelve False si se salteó.
+    """
+    with _rebuild_lock:
+        state = _rebuild_state
+        if time.monotonic() - state["last"] < REBUILD_DEBOUNCE and _root_mtime() == state["root_mtime"]:
+            return False
+        generate_json(base_url=base_url, rename=True)
+        state["root_mtime"] = _root_mtime()  # después de escribir el JSON/renombrar
+        state["last"] = time.monotonic()
+        return True
+
 class StrudelHandler(SimpleHTTPRequestHandler):
+    # Con un pool fijo, una conexión ociosa no puede retener un worker para siempre
+    timeout = HTTP_TIMEOUT
+
     # CORS
     def end_headers(self):
         self.send_header("Access-Control-Allow-Origin", "*")
@@ -84,11 +319,15 @@ class StrudelHandler(SimpleHTTPRequestHandler):
         self.send_response(204)
         self.end_headers()
 
-    def _send_bytes(self, body: bytes, ctype="application/octet-stream"):
+    def _send_bytes(self, body: bytes, ctype="application/octet-stream", encoding=None, vary=None):
         try:
             self.send_response(200)
             self.send_header("Content-Type", ctype)
             self.send_header("Content-Length", str(len(body)))
+            if encoding:
+                self.send_header("Content-Encoding", encoding)
+            if vary:
+                self.send_header("Vary", vary)
             self.send_header("Cache-Control", "no-cache")
             self.end_headers()
             if self.command != "HEAD":
@@ -99,21 +338,132 @@ class StrudelHandler(SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, f"Server error: {e}")
 
-    def _send_file_streaming(self, path: Path, ctype="application/octet-stream"):
+    def _set_cork(self, on: bool):
+        """TCP_CORK (Linux) mientras se envía un archivo; al activarlo agranda también SO_SNDBUF."""
+        if not hasattr(socket, "TCP_CORK"):
+            return
+        sock = self.connection
         try:
-            size = path.stat().st_size
-            self.send_response(200)
+            if on:
+                sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 1 << 20)
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_CORK, 1 if on else 0)
+        except OSError:
+            pass  # conexión cerrada por el cliente
+
+    def _sendfile(self, path, offset, end):
+        """Copia [offset, end) al socket con os.sendfile (page cache -> socket, sin pasar por Python)."""
+        self.wfile.flush()
+        out_fd = self.connection.fileno()
+        in_fd = os.open(str(path), os.O_RDONLY)
+        try:
+            while offset < end:
+                try:
+                    sent = os.sendfile(out_fd, in_fd, offset, end - offset)
+                except BlockingIOError:
+                    # socket con timeout = no bloqueante: esperar a que haya lugar
+                    _, writable, _ = select.select([], [out_fd], [], self.timeout)
+                    if not writable:
+                        break
+                    continue
+                except (BrokenPipeError, ConnectionResetError):
+                    break
+                if sent == 0:
+                    break
+                offset += sent
+        finally:
+            os.close(in_fd)
+
+    def _parse_range(self, size):
+        """
+        Interpreta 'Range: bytes=a-b' (un solo rango). Devuelve (start, end) inclusivo,
+        None si no hay Range válido (se envía completo) o False si no es satisfacible.
+        """
+        rng = self.headers.get("Range")
+        if not rng:
+            return None
+        m = _RANGE_RE.match(rng.strip())
+        if not m:
+            return None
+        a, b = m.groups()
+        if not a and not b:
+            return None
+        if not a:
+            # bytes=-N -> últimos N bytes
+            length = int(b)
+            if length == 0 or size == 0:
+                return False
+            return max(size - length, 0), size - 1
+        start = int(a)
+        end = int(b) if b else size - 1
+        if start >= size or end < start:
+            return False
+        return start, min(end, size - 1)
+
+    def _not_modified(self, st) -> bool:
+        """True si el If-Modified-Since del cliente es >= al mtime del archivo."""
+        ims = self.headers.get("If-Modified-Since")
+        if not ims or "If-None-Match" in self.headers:
+            return False
+        try:
+            since = email.utils.parsedate_to_datetime(ims)
+        except (TypeError, ValueError, IndexError, OverflowError):
+            return False
+        if since is None or since.tzinfo is None:
+            return False
+        return int(st.st_mtime) <= since.timestamp()
+
+    def _send_file_streaming(self, path: str, ctype="application/octet-stream", st=None):
+        try:
+            if st is None:
+                st = os.stat(path)
+            size = st.st_size
+            last_modified = email.utils.formatdate(st.st_mtime, usegmt=True)
+            if self._not_modified(st):
+                self.send_response(304)
+                self.send_header("Last-Modified", last_modified)
+                self.send_header("Cache-Control", "no-cache")
+                self.end_headers()
+                return
+            rng = self._parse_range(size)
+            if rng is False:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{size}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            if rng:
+                start, end = rng
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+            else:
+                start, end = 0, size - 1
+                self.send_response(200)
             self.send_header("Content-Type", ctype)
-            self.send_header("Content-Length", str(size))
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Last-Modified", last_modified)
             self.send_header("Cache-Control", "no-cache")
-            self.end_headers()
             if self.command == "HEAD":
+                self.end_headers()
                 return
+            if hasattr(os, "sendfile"):
+                # headers + primeros bytes del archivo en segmentos completos
+                self._set_cork(True)
+                try:
+                    self.end_headers()
+                    self._sendfile(path, start, end + 1)
+                finally:
+                    self._set_cork(False)
+                return
+            self.end_headers()
             with open(path, "rb") as f:
-                while True:
-                    chunk = f.read(64 * 1024)
+                f.seek(start)
+                remaining = end - start + 1
+                while remaining > 0:
+                    chunk = f.read(min(64 * 1024, remaining))
                     if not chunk:
                         break
+                    remaining -= len(chunk)
                     try:
                         self.wfile.write(chunk)
                     except (BrokenPipeError, ConnectionAbortedError):
@@ -123,11 +473,62 @@ class StrudelHandler(SimpleHTTPRequestHandler):
         except Exception as e:
             self.send_error(500, f"Server error: {e}")
 
-    def _serve_strudel_json(self):
+    # Cache del JSON: se relee sólo si cambia (mtime, tamaño, inodo); el mtime solo no
+    # alcanza en FAT/exFAT (2 s), pero os.replace en generate_json siempre cambia el inodo.
+    # Se guarda ya serializado, partido alrededor de _base para armar la respuesta sin
+    # json.load/json.dumps.
+    _json_cache = {"key": None, "tmpl_prefix": b"", "tmpl_suffix": b""}
+    _json_lock = threading.Lock()
+
+    @classmethod
+    def _load_json_cached(cls):
+        """Devuelve (prefix, suffix) del JSON serializado, recargándolo si cambió en disco."""
         target = ROOT / JSON_NAME
+        st = os.stat(target)
+        cache = cls._json_cache
+        with cls._json_lock:
+            key = (st.st_mtime_ns, st.st_size, st.st_ino)
+            if key != cache["key"]:
+                data = _load_json_file(target)
+                data.pop("_base", None)
+                tmpl = _dumps({"_base": "__BASE__", **data})
+                prefix, _, suffix = tmpl.partition(b'"__BASE__"')
+                cache["key"] = key
+                cache["tmpl_prefix"] = prefix
+                cache["tmpl_suffix"] = suffix
+            return cache["tmpl_prefix"], cache["tmpl_suffix"]
+
+    @staticmethod
+    @functools.lru_cache(maxsize=8)
+    def _build_body(prefix: bytes, suffix: bytes, host: str):
+        """Arma el JSON final para un Host y su versión gzip. Devuelve (raw, gz)."""
+        base = _dumps(f"http://{host}/")
+        raw = prefix + base + suffix
+        return raw, gzip.compress(raw, compresslevel=6)
+
+    def _accepts_gzip(self) -> bool:
+        """True si Accept-Encoding acepta gzip con q > 0 (explícito, o vía '*')."""
+        star = None
+        for part in self.headers.get("Accept-Encoding", "").split(","):
+            coding, _, params = part.partition(";")
+            coding = coding.strip().lower()
+            q = 1.0
+            for param in params.split(";"):
+                key, _, value = param.partition("=")
+                if key.strip().lower() == "q":
+                    try:
+                        q = float(value)
+                    except ValueError:
+                        q = 0.0
+            if coding in ("gzip", "x-gzip"):
+                return q > 0
+            if coding == "*":
+                star = q > 0
+        return bool(star)
+
+    def _serve_strudel_json(self):
         try:
-            with open(target, "r", encoding="utf-8") as f:
-                data = json.load(f)
+            prefix, suffix = self._load_json_cached()
         except FileNotFoundError:
             self.send_error(404, f"No existe {JSON_NAME} en esta carpeta")
             return
@@ -136,20 +537,25 @@ class StrudelHandler(SimpleHTTPRequestHandler):
             return
 
         # Reescribir _base dinámicamente con el Host real (localhost:5432, IP:puerto, etc.)
+        # (cacheado por Host; al cambiar el JSON cambian prefix/suffix y la clave)
         host = self.headers.get("Host") or f"localhost:{PORT}"
-        data["_base"] = f"http://{host}/"
-        body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-        self._send_bytes(body, "application/json; charset=utf-8")
+        raw, gz = self._build_body(prefix, suffix, host)
+        # Vary en ambas variantes, para que un cache no sirva la equivocada
+        if self._accepts_gzip():
+            self._send_bytes(gz, "application/json; charset=utf-8", encoding="gzip", vary="Accept-Encoding")
+        else:
+            self._send_bytes(raw, "application/json; charset=utf-8", vary="Accept-Encoding")
 
     def do_GET(self):
         # Endpoint para reconstruir catálogo al vuelo: /rebuild
         if self.path.startswith("/rebuild"):
             # Opcional: volver a escanear y regenerar el JSON mientras el server corre
             try:
-                rename_files()
-                # base provisional: se reescribe al responder igualmente
-                generate_json(base_url=f"http://localhost:{PORT}/")
-                msg = b'{"ok":true,"message":"rebuild done"}'
+                # renombra + regenera en paralelo; base provisional: se reescribe al responder igualmente
+                if rebuild(base_url=f"http://localhost:{PORT}/"):
+                    msg = b'{"ok":true,"message":"rebuild done"}'
+                else:
+                    msg = b'{"ok":true,"cached":true,"message":"rebuild skipped, nothing changed"}'
                 self._send_bytes(msg, "application/json; charset=utf-8")
             except Exception as e:
                 self.send_error(500, f"rebuild error: {e}")
@@ -162,18 +568,25 @@ class StrudelHandler(SimpleHTTPRequestHandler):
 
         # Archivos estáticos (audio, etc.)
         rel = self.path.lstrip("/").split("?", 1)[0].split("#", 1)[0]
-        local = (ROOT / rel).resolve()
+        rel_norm = os.path.normpath(rel)
 
-        # Evitar path traversal
-        if not str(local).startswith(str(ROOT)):
+        # Evitar path traversal (sólo strings, sin resolve(); no sigue symlinks)
+        if (rel_norm == ".." or rel_norm.startswith(".." + os.sep)
+                or os.path.isabs(rel_norm) or os.path.splitdrive(rel_norm)[0]):
             self.send_error(403, "Forbidden")
             return
 
-        if local.is_file():
-            ctype, _ = mimetypes.guess_type(str(local))
+        # Un solo stat: existencia, tipo, tamaño y mtime
+        local_str = os.path.join(_ROOT_STR, rel_norm)
+        try:
+            st = os.stat(local_str)
+        except OSError:
+            st = None
+        if st is not None and stat.S_ISREG(st.st_mode):
+            ctype, _ = mimetypes.guess_type(local_str)
             if not ctype:
                 ctype = "application/octet-stream"
-            self._send_file_streaming(local, ctype)
+            self._send_file_streaming(local_str, ctype, st)
             return
 
         # fallback del padre (404/listados si están habilitados)
@@ -181,32 +594,79 @@ class StrudelHandler(SimpleHTTPRequestHandler):
 
     def do_HEAD(self):
         if self.path in ("/", f"/{JSON_NAME}"):
-            # calcular tamaño del JSON dinámico
-            target = ROOT / JSON_NAME
-            try:
-                with open(target, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                host = self.headers.get("Host") or f"localhost:{PORT}"
-                data["_base"] = f"http://{host}/"
-                body = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
-                self.send_response(200)
-                self.send_header("Content-Type", "application/json; charset=utf-8")
-                self.send_header("Content-Length", str(len(body)))
-                self.send_header("Cache-Control", "no-cache")
-                self.end_headers()
-            except Exception:
-                return self.do_GET()
+            # mismo cache que GET; _send_bytes no escribe el body en HEAD
+            self._serve_strudel_json()
         else:
             return self.do_GET()
 
+class StrudelHTTPServer(ThreadingHTTPServer):
+    """
+    ThreadingHTTPServer con HTTP_THREADS workers fijos en vez de un thread por conexión.
+    Una conexión recién aceptada espera en un selector (thread aparte) hasta que el
+    cliente manda algo: las conexiones especulativas/ociosas no ocupan workers.
+    Los workers son daemon: Ctrl+C no espera a conexiones colgadas.
+    """
+    def __init__(self, *args, **kwargs):
+        self._requests = queue.SimpleQueue()   # listas para un worker
+        self._incoming = queue.SimpleQueue()   # recién aceptadas, todavía sin datos
+        self._wake_r, self._wake_w = socket.socketpair()
+        self._wake_w.setblocking(False)
+        super().__init__(*args, **kwargs)
+        threading.Thread(target=self._watch_idle, name="strudel-http-idle", daemon=True).start()
+        for i in range(HTTP_THREADS):
+            threading.Thread(target=self._worker, name=f"strudel-http-{i}", daemon=True).start()
+
+    def _worker(self):
+        while True:
+            request, client_address = self._requests.get()
+            self.process_request_thread(request, client_address)
+
+    def _watch_idle(self):
+        """Pasa a los workers sólo sockets legibles; cierra los que no mandan nada en HTTP_TIMEOUT."""
+        sel = selectors.DefaultSelector()
+        sel.register(self._wake_r, selectors.EVENT_READ)
+        last_sweep = time.monotonic()
+        while True:
+            for key, _ in sel.select(timeout=1.0):
+                if key.fileobj is self._wake_r:
+                    self._wake_r.recv(4096)
+                    while True:
+                        try:
+                            request, client_address = self._incoming.get_nowait()
+                        except queue.Empty:
+                            break
+                        sel.register(request, selectors.EVENT_READ, (client_address, time.monotonic()))
+                else:
+                    sel.unregister(key.fileobj)
+                    self._requests.put((key.fileobj, key.data[0]))
+            now = time.monotonic()
+            if now - last_sweep >= 1.0:
+                last_sweep = now
+                for key in list(sel.get_map().values()):
+                    if key.data is not None and now - key.data[1] > HTTP_TIMEOUT:
+                        sel.unregister(key.fileobj)
+                        self.shutdown_request(key.fileobj)
+
+    def get_request(self):
+        request, client_address = super().get_request()
+        # Respuestas JSON chicas: no esperar a Nagle
+        request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return request, client_address
+
+    def process_request(self, request, client_address):
+        self._incoming.put((request, client_address))
+        try:
+            self._wake_w.send(b"\0")
+        except BlockingIOError:
+            pass  # el watcher ya tiene despertadores pendientes
+
 if __name__ == "__main__":
     # Paso 1: preparar catálogo en disco, recrear el strudel.json
-    rename_files()
-    generate_json(base_url=f"http://localhost:{PORT}/")
+    rebuild(base_url=f"http://localhost:{PORT}/")
 
     # Paso 2: levantar el server
-    with ThreadingHTTPServer(("0.0.0.0", PORT), StrudelHandler) as server:
-        print(f"Servidor corriendo en http://localhost:{PORT}/")
+    with StrudelHTTPServer(("0.0.0.0", PORT), StrudelHandler) as server:
+        print(f"Servidor corriendo en http://localhost:{PORT}/ ({HTTP_THREADS} workers)")
         print(f"- GET /           -> {JSON_NAME} (con _base dinámico)")
         print(f"- GET /{JSON_NAME} -> {JSON_NAME} (con _base dinámico)")
         print( "- GET /rebuild    -> renombra + regenera JSON al vuelo")
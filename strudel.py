@@ -1,8 +1,26 @@
 import os
 import re
+import sys
+import errno
+import ctypes
 import json
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
 from pathlib import Path
 
+# orjson (opcional) serializa directo a bytes UTF-8 compactos, mucho más rápido
+try:
+    import orjson
+
+    def _dump(obj, fp):
+        fp.write(orjson.dumps(obj))
+except ImportError:
+    _encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+
+    def _dump(obj, fp):
+        # sin orjson: escribir por partes, sin armar todo el string en memoria
+        fp.writelines(chunk.encode("utf-8") for chunk in _encoder.iterencode(obj))
+
 BASE_URL = "https://raw.githubusercontent.com/nucklearproject/samples/master/"
 ROOT = Path(".").resolve()
 
@@ -10,6 +28,15 @@ ROOT = Path(".").resolve()
 IGNORE_DIRS = {".git", "node_modules", "examples", "__pycache__", ".venv"}
 # Extensiones permitidas para renombrar y para el JSON
 ALLOW_EXTS = {".wav", ".flac", ".ogg"}
+# A partir de cuántos archivos conviene escanear en paralelo (ver _scan)
+PARALLEL_SCAN_MIN_FILES = 50_000
+_ALLOW_TAILS = tuple(ALLOW_EXTS)  # para str.endswith, ya en minúsculas
+_IGNORE = frozenset(IGNORE_DIRS)
+_skip_dir = _IGNORE.__contains__  # método ligado: sin lookup en cada directorio
+
+# Regex precompiladas para safe_audio_name
+_SP = re.compile(r"\s+")
+_DH = re.compile(r"-{2,}")
 
 def safe_audio_name(filename: str) -> str:
     """
@@ -18,82 +45,201 @@ def safe_audio_name(filename: str) -> str:
     - Colapsa múltiples '-' consecutivos
     - Mantiene extensión original
     """
-    p = Path(filename)
-    stem = re.sub(r"\s+", "-", p.stem.strip())
-    stem = re.sub(r"-{2,}", "-", stem)
-    return f"{stem}{p.suffix}"
-
-def rename_files():
+    # Camino rápido: sin espacios (isprintable descarta el resto de whitespace) ni '--'
+    if " " not in filename and "--" not in filename and filename.isprintable():
+        return filename
+    i = filename.rfind(".")
+    if i <= 0:
+        stem, ext = filename, ""
+    else:
+        stem, ext = filename[:i], filename[i:]
+    stem = _SP.sub("-", stem.strip())
+    stem = _DH.sub("-", stem)
+    return f"{stem}{ext}"
+
+# renameat2(RENAME_NOREPLACE) en Linux: renombra sólo si el destino no existe, en una
+# sola syscall (sin ventana entre el chequeo y el rename). Fuera de Linux: lexists + os.rename.
+_AT_FDCWD = -100
+_RENAME_NOREPLACE = 1
+
+def _load_renameat2():
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        fn = ctypes.CDLL(None, use_errno=True).renameat2  # glibc >= 2.28
+    except (OSError, AttributeError):
+        return None
+    fn.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_int, ctypes.c_char_p, ctypes.c_uint]
+    fn.restype = ctypes.c_int
+    return fn
+
+_renameat2 = _load_renameat2()
+
+def _rename_noreplace(src: str, dst: str) -> bool:
+    """Renombra src -> dst sin pisar; devuelve False si dst ya existe."""
+    if _renameat2 is not None:
+        if _renameat2(_AT_FDCWD, os.fsencode(src), _AT_FDCWD, os.fsencode(dst), _RENAME_NOREPLACE) == 0:
+            return True
+        err = ctypes.get_errno()
+        if err == errno.EEXIST:
+            return False
+        if err not in (errno.EINVAL, errno.ENOSYS):  # FS sin soporte del flag -> os.rename
+            raise OSError(err, os.strerror(err), src, None, dst)
+    # os.rename pisa en silencio (macOS, FS case-insensitive): un stat por rename real
+    if os.path.lexists(dst):
+        return False
+    try:
+        os.rename(src, dst)
+    except FileExistsError:  # Windows
+        return False
+    return True
+
+def _walk(root, recursive=True):
     """
-    Renombra todos los archivos de audio dentro del árbol, reemplazando espacios por '-'.
-    Maneja colisiones añadiendo sufijos incrementales.
+    Recorre el árbol con os.scandir y devuelve los DirEntry de archivos.
+    Aprovecha is_dir()/is_file() del propio readdir (sin stat extra) y poda
+    directorios ocultos/ignorados. Con recursive=False sólo mira 'root'.
     """
-    for dirpath, dirs, files in os.walk(ROOT, topdown=True):
-        # Podar dirs ignorados/ocultos
-        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in IGNORE_DIRS]
-
-        for fname in files:
-            src = Path(dirpath) / fname
-            if src.suffix.lower() not in ALLOW_EXTS:
-                continue
-
-            target_name = safe_audio_name(src.name)
-            if target_name == src.name:
-                continue  # ya está bien
-
-            dst = src.with_name(target_name)
-
-            # Si existe, buscar un nombre disponible: nombre-1.ext, -2.ext, ...
-            if dst.exists():
-                base = Path(target_name).stem
-                ext = Path(target_name).suffix
-                i = 1
-                while True:
-                    cand = src.with_name(f"{base}-{i}{ext}")
-                    if not cand.exists():
-                        dst = cand
-                        break
-                    i += 1
-
-            # Renombrar
-            print(f"[rename] '{src.name}' -> '{dst.name}'  en {src.parent}")
-            src.rename(dst)
-
-def generate_json():
+    try:
+        it = os.scandir(root)
+    except OSError:
+        return  # ilegible o borrado durante el recorrido: se saltea, como os.walk
+    with it:
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                name = e.name
+                if not recursive or name[:1] == "." or _skip_dir(name):
+                    continue
+                yield from _walk(e.path)
+            elif e.is_file():  # sigue symlinks a archivos, como os.walk
+                yield e
+
+def rename_files(root=ROOT, recursive=True):
     """
-    Genera strudel.json después de renombrar, incluyendo wav, flac y ogg,
-    agrupados por la carpeta inmediata que los contiene.
-    Rutas con prefijo '/' y separadores POSIX.
+    Renombra todos los archivos de audio dentro del árbol, reemplazando espacios por '-'.
+    Maneja colisiones añadiendo sufijos incrementales.
     """
-    data = {"_base": BASE_URL}
-
-    for dirpath, dirs, files in os.walk(ROOT, topdown=True):
-        # Podar dirs ignorados/ocultos
-        dirs[:] = [d for d in dirs if not d.startswith(".") and d not in IGNORE_DIRS]
+    # Primero juntar los renombres pendientes (no renombrar mientras se recorre)
+    pending = []
+    for entry in _walk(root, recursive):
+        name = entry.name
+        low = name if name.islower() else name.lower()
+        if not low.endswith(_ALLOW_TAILS):
+            continue
 
-        rel_dir = Path(dirpath).relative_to(ROOT)
-        if rel_dir == Path("."):
+        target_name = safe_audio_name(name)
+        if target_name == name:
+            continue  # ya está bien
+
+        pending.append((os.path.dirname(entry.path), name, target_name))
+
+    # Nombres existentes por directorio (un listdir por carpeta, sin stat por candidato)
+    by_dir = {}
+    for parent, name, target_name in pending:
+        names = by_dir.get(parent)
+        if names is None:
+            names = by_dir[parent] = set(os.listdir(parent))
+
+        # Si existe, buscar un nombre disponible: nombre-1.ext, -2.ext, ...
+        # (el set evita la mayoría de los intentos; renameat2 confirma sin pisar)
+        src = os.path.join(parent, name)
+        base, ext = os.path.splitext(target_name)
+        dst_name = target_name
+        i = 0
+        while dst_name in names or not _rename_noreplace(src, os.path.join(parent, dst_name)):
+            names.add(dst_name)
+            i += 1
+            dst_name = f"{base}-{i}{ext}"
+
+        print(f"[rename] '{name}' -> '{dst_name}'  en {parent}")
+        names.discard(name)
+        names.add(dst_name)
+
+def _collect(root):
+    """Lista (carpeta inmediata, '/ruta/relativa') de los audios bajo 'root'."""
+    root_len = len(str(ROOT)) + 1
+    items = []
+    for entry in _walk(root):
+        fname = entry.name
+        low = fname if fname.islower() else fname.lower()
+        if not low.endswith(_ALLOW_TAILS):
             continue
 
-        name = rel_dir.name
-        if name.startswith(".") or name in IGNORE_DIRS:
+        rel = entry.path[root_len:]
+        if os.sep != "/":
+            rel = rel.replace(os.sep, "/")
+        rel_dir, sep, _ = rel.rpartition("/")
+        if not sep:
+            continue  # archivos sueltos en ROOT no forman grupo
+
+        items.append((rel_dir[rel_dir.rfind("/") + 1:], "/" + rel))
+    return items
+
+def _scan_subtree(top, rename=False):
+    """Worker: (opcionalmente) renombra y después lista una carpeta de primer nivel."""
+    if rename:
+        rename_files(top)
+    return _collect(top)
+
+def _scan(rename=False):
+    """
+    Recorre ROOT; si el árbol es grande reparte cada carpeta de primer nivel en un
+    proceso aparte (son independientes entre sí). Devuelve la lista plana de (grupo, ruta).
+    """
+    if rename:
+        rename_files(ROOT, recursive=False)  # audios sueltos en ROOT
+
+    with os.scandir(ROOT) as it:
+        tops = [e.path for e in it
+                if e.is_dir(follow_symlinks=False)
+                and e.name[:1] != "." and not _skip_dir(e.name)]
+
+    # Levantar el pool cuesta más que recorrer un árbol chico: estimar el trabajo con
+    # las entradas del primer nivel de cada carpeta y sólo paralelizar si vale la pena
+    # (las carpetas ilegibles se saltean, igual que en _walk)
+    readable, n_files = [], 0
+    for top in tops:
+        try:
+            n_files += len(os.listdir(top))
+        except OSError:
             continue
+        readable.append(top)
+    tops = readable
 
-        items = []
-        for f in files:
-            p = Path(dirpath) / f
-            if p.suffix.lower() in ALLOW_EXTS:
-                rel = p.relative_to(ROOT).as_posix()
-                items.append("/" + rel)
+    if len(tops) < 2 or n_files < PARALLEL_SCAN_MIN_FILES:
+        results = [_scan_subtree(top, rename) for top in tops]
+    else:
+        with ProcessPoolExecutor(max_workers=min(len(tops), os.cpu_count() or 1)) as ex:
+            results = list(ex.map(_scan_subtree, tops, [rename] * len(tops)))
+    return [item for items in results for item in items]
 
-        if items:
-            items.sort()
-            data.setdefault(name, []).extend(items)
+def generate_json(rename=False):
+    """
+    Genera strudel.json después de renombrar, incluyendo wav, flac y ogg,
+    agrupados por la carpeta inmediata que los contiene.
+    Rutas con prefijo '/' y separadores POSIX.
+    Con rename=True los mismos workers renombran antes de listar (ver rename_files).
+    """
+    data = {"_base": BASE_URL}
 
-    with open(ROOT / "strudel.json", "w", encoding="utf-8", newline="\n") as fp:
-        json.dump(data, fp, ensure_ascii=False, separators=(",", ":"))
+    # (carpeta inmediata, ruta) en una sola lista plana; se ordena una única vez
+    all_items = _scan(rename)
+    all_items.sort()
+    for name, group in groupby(all_items, key=lambda t: t[0]):
+        data[name] = [p for _, p in group]
+
+    # Escribir a un temporal y reemplazar: nunca truncar el strudel.json que el server
+    # pueda tener abierto o mapeado en memoria
+    target = ROOT / "strudel.json"
+    tmp = ROOT / f"strudel.json.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "wb") as fp:
+            _dump(data, fp)
+        os.replace(tmp, target)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
 
 if __name__ == "__main__":
-    rename_files()
-    generate_json()
+    generate_json(rename=True)
     print("✅ Listongo: renombrados los archivos de audio y generado strudel.json")